@@ -10,10 +10,18 @@
 # =============================================================================
 
 # ------------------------- Importar Librerías -------------------------
+import os  # Para gestionar las rutas de la caché en disco
+import platform  # Para elegir cómo lanzar los procesos según el sistema operativo
+import multiprocessing  # Para obtener el contexto de arranque de los procesos
+from collections import OrderedDict  # Para la memoria LRU de vecinas más cercanas
+from concurrent.futures import ProcessPoolExecutor  # Para recomendar a varios usuarios en paralelo
 import pandas as pd  # Para manipulación de datos en DataFrames
 import numpy as np  # Para operaciones numéricas
-from sklearn.preprocessing import MultiLabelBinarizer  # Para transformar listas en vectores binarios
-from sklearn.neighbors import NearestNeighbors  # Para encontrar vecinos similares (métrica coseno)
+
+try:
+    from numba import njit  # Opcional: compila el cálculo de scores a código nativo
+except ImportError:
+    njit = None
 
 # --------------------- Configuraciones de Visualización ---------------------
 pd.set_option('display.max_rows', None)
@@ -21,77 +29,215 @@ pd.set_option('display.max_columns', None)
 pd.set_option('display.width', None)
 pd.set_option('display.max_colwidth', None)
 
+# ------------------------- Rutas de Datos y Caché -------------------------
+CLEAN_DIR = 'Dataset/clean'
+CACHE_DIR = 'Dataset/cache'
+MOVIES_CACHE = os.path.join(CACHE_DIR, 'movies_processed.parquet')
+GENRES_CACHE = os.path.join(CACHE_DIR, 'genre_features.npy')
+CLASSES_CACHE = os.path.join(CACHE_DIR, 'genre_classes.npy')
+
+# ------------------------- Ejecución en Paralelo -------------------------
+# Fuera de Linux no hay 'fork' y los datos deben copiarse a cada proceso: por
+# debajo de este número de usuarios no compensa y se ejecuta en un solo proceso.
+PARALLEL_MIN_USERS = 20
+
+# ------------------------- Exportación de Recomendaciones -------------------------
+RECOMMENDATIONS_CSV = 'recommendations.csv'
+
+# ------------------------- Recomendaciones -------------------------
+DEFAULT_N_RECOMMENDATIONS = 10
+
+# Vecinas más cercanas que se buscan en el camino "tailored": al menos
+# TAILORED_MIN_NEIGHBORS (muchas películas empatan en similitud y el rating y la
+# duración deben poder desempatarlas) y TAILORED_NEIGHBORS_PER_REC por recomendación
+TAILORED_MIN_NEIGHBORS = 200
+TAILORED_NEIGHBORS_PER_REC = 4
+
+# Vecinos más cercanos ya calculados por combinación de géneros preferidos (LRU)
+TAILORED_CACHE_SIZE = 256
+_tailored_cache = OrderedDict()
+
+# Datos de solo lectura compartidos con los procesos hijos (heredados vía 'fork')
+_worker_data = {}
+
 
 # =============================================================================
 # FUNCIONES DE CARGA Y PREPROCESAMIENTO DE DATOS
 # =============================================================================
 
-def load_and_process_movies():
+def load_and_process_movies(use_cache=True, min_rating=None):
+    """
+    Carga las películas procesadas desde la caché en disco (Parquet + NumPy) si
+    existe y está al día respecto a los CSV; si no, las procesa con
+    `process_movies` y guarda el resultado para las siguientes ejecuciones.
+
+    Si se indica `min_rating`, se descartan de antemano las películas con un rating
+    inferior (manteniendo alineadas las matrices de géneros), de modo que todas las
+    operaciones por usuario trabajan sobre un conjunto de candidatas más pequeño.
+
+    Retorna:
+      movies  : DataFrame de películas procesadas.
+      genre_classes: Lista de géneros, en el orden de las columnas de las matrices.
+      genre_norm: Matriz float32 de géneros normalizada por filas (norma L2).
+      genre_bits: Géneros de cada película empaquetados como bits en un uint64.
+    """
+    if use_cache and _cache_is_valid():
+        movies = pd.read_parquet(MOVIES_CACHE, engine='pyarrow', use_threads=True)
+        genre_features = np.load(GENRES_CACHE)
+        genre_classes = np.load(CLASSES_CACHE).tolist()
+    else:
+        movies, genre_classes, genre_features = process_movies()
+        if use_cache:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            movies.to_parquet(MOVIES_CACHE, engine='pyarrow', compression='zstd', index=False)
+            np.save(GENRES_CACHE, genre_features)
+            np.save(CLASSES_CACHE, np.asarray(genre_classes, dtype=str))
+
+    # --- Filtrar Películas por Rating Mínimo ---
+    if min_rating is not None:
+        qualified = np.flatnonzero(movies['averageRating'].values >= min_rating)
+        movies = movies.iloc[qualified].reset_index(drop=True)
+        genre_features = genre_features[qualified]
+
+    return movies, genre_classes, build_genre_norm(genre_features), build_genre_bits(genre_features)
+
+
+def _cache_is_valid():
+    """
+    Indica si los ficheros de caché existen y son más recientes que los CSV de origen
+    y que este mismo script (si cambia el preprocesamiento, la caché se regenera).
+    """
+    cache_files = [MOVIES_CACHE, GENRES_CACHE, CLASSES_CACHE]
+    if not all(os.path.exists(path) for path in cache_files):
+        return False
+    sources = [os.path.join(CLEAN_DIR, name) for name in
+               ('movies_clean.csv', 'ratings_clean.csv', 'title_akas_clean.csv')]
+    sources.append(os.path.abspath(__file__))
+    newest_source = max((os.path.getmtime(path) for path in sources if os.path.exists(path)), default=0)
+    return min(os.path.getmtime(path) for path in cache_files) >= newest_source
+
+
+def build_genre_norm(genre_features):
+    """
+    Normaliza cada fila de la matriz de géneros (norma L2): así la similitud coseno
+    es un simple producto escalar.
+    """
+    genre_norm = genre_features.astype(np.float32)
+    norms = np.linalg.norm(genre_norm, axis=1, keepdims=True)
+    genre_norm /= np.where(norms == 0, 1, norms)
+    return genre_norm
+
+
+def build_genre_bits(genre_features):
+    """
+    Empaqueta los géneros de cada película en un único uint64 (bit i = género i),
+    de modo que comprobar si tiene algún género de un conjunto es un AND por fila.
+    """
+    n_genres = genre_features.shape[1]
+    if n_genres > 64:
+        raise ValueError(f"No se pueden empaquetar {n_genres} géneros en 64 bits")
+    weights = np.left_shift(np.uint64(1), np.arange(n_genres, dtype=np.uint64))
+    return genre_features.astype(np.uint64) @ weights
+
+
+def read_clean_csv(name, columns):
+    """
+    Lee un CSV limpio con el lector multihilo de pyarrow, cargando solo las
+    columnas indicadas.
+    """
+    return pd.read_csv(os.path.join(CLEAN_DIR, name), engine='pyarrow', usecols=columns, dtype_backend='pyarrow')
+
+
+def to_float_array(series):
+    """
+    Convierte una columna a un array float64 de NumPy. Los valores ausentes o no
+    numéricos (p. ej. "\\N") quedan como NaN, también en columnas de pyarrow, donde
+    `fillna` no los detectaría.
+    """
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def process_movies():
     """
     Carga y procesa los datasets relacionados con las películas:
-      - Carga películas, actores, ratings y títulos alternativos.
+      - Carga películas, ratings y títulos alternativos.
       - Filtra títulos en español (región "ES") y actualiza el título principal.
       - Integra la información de ratings.
       - Preprocesa la duración y los géneros.
-      - Crea la representación binaria de los géneros y entrena el modelo de vecinos.
+      - Crea la representación binaria de los géneros (excluyendo "Documentary" y "Music").
 
     Retorna:
       movies  : DataFrame de películas procesadas.
-      mlb     : Instancia de MultiLabelBinarizer ajustada a los géneros.
-      nn_model: Modelo NearestNeighbors entrenado sobre la representación de géneros.
+      genre_classes: Lista de géneros, en el orden de las columnas de `genre_features`.
+      genre_features: Matriz binaria (películas x géneros) alineada con `movies`.
     """
-    # --- Cargar Datasets de Películas, Actores y Ratings ---
-    movies = pd.read_csv('Dataset/clean/movies_clean.csv')
-    _ = pd.read_csv('Dataset/clean/actors_clean.csv')  # Actores no se usa por el momento
-    ratings = pd.read_csv('Dataset/clean/ratings_clean.csv')
+    # --- Cargar Datasets de Películas y Ratings (solo las columnas necesarias) ---
+    # Actores no se usa por el momento, así que no se carga
+    # primaryTitle se sustituye por el título en español, así que tampoco se lee
+    movies = read_clean_csv('movies_clean.csv', ['tconst', 'genres', 'runtimeMinutes'])
+    ratings = read_clean_csv('ratings_clean.csv', ['tconst', 'averageRating', 'numVotes'])
 
     # --- Filtrar Títulos en Español ---
-    titles_akas = pd.read_csv('Dataset/clean/title_akas_clean.csv')
-    titles_akas_es = titles_akas[
-        (titles_akas['region'] == 'ES')
-    ].sort_values('ordering').drop_duplicates('titleId', keep='first')
-
-    # --- Unir Datos ---
-
-    movies = movies.merge(
-        titles_akas_es[['titleId', 'title']],
-        left_on='tconst',
-        right_on='titleId',
-        how='inner'
-    )
-    movies['primaryTitle'] = movies['title']
-    movies.drop(['titleId', 'title'], axis=1, inplace=True)
-
-    # --- Integrar Ratings ---
-    movies = movies.merge(
-        ratings[['tconst', 'averageRating', 'numVotes']],
-        on='tconst',
-        how='left'
+    titles_akas = read_clean_csv('title_akas_clean.csv', ['titleId', 'title', 'region', 'ordering'])
+    titles_akas_es = titles_akas[titles_akas['region'] == 'ES']
+
+    # Nos quedamos con el título de menor 'ordering' de cada película (sin ordenar todo)
+    first_title = titles_akas_es.groupby('titleId', sort=False)['ordering'].idxmin()
+    titles_akas_es = titles_akas_es.loc[first_title, ['titleId', 'title']]
+
+    # --- Unir Datos (título en español + ratings) ---
+    # Un único índice por tconst para ambas uniones, en lugar de dos merge sucesivos
+    titles_es = titles_akas_es.set_index('titleId')['title'].rename('primaryTitle').rename_axis('tconst')
+    ratings = ratings.set_index('tconst')[['averageRating', 'numVotes']]
+    movies = (
+        movies.set_index('tconst')
+        .join(titles_es, how='inner')
+        .join(ratings, how='left')
+        .reset_index()
     )
 
     # --- Preprocesamiento de Datos ---
-    movies['runtimeMinutes'] = pd.to_numeric(movies['runtimeMinutes'], errors='coerce').fillna(
-        movies['runtimeMinutes'].median()).astype(int)
+    runtime = to_float_array(movies['runtimeMinutes'])
+    movies['runtimeMinutes'] = np.where(np.isnan(runtime), np.nanmedian(runtime), runtime).astype(np.int32)
+
+    # El rating y su score no dependen del usuario: se calculan una sola vez
+    movies['averageRating'] = np.nan_to_num(to_float_array(movies['averageRating']), nan=0.0).astype(np.float32)
+    movies['rating_score'] = (movies['averageRating'].values / 10.0).astype(np.float32)
 
     # Nos aseguramos de que no haya películas sin género
     movies = movies.dropna(subset=['genres'])
 
-    # Convertir géneros a lista y excluir "Documentary" y "Music"
-    movies['genres_list'] = movies['genres'].apply(
-        lambda x: [genre.strip() for genre in x.split(',')]
-    )
-    movies = movies[
-        ~movies['genres_list'].apply(
-            lambda x: any(g in x for g in ['Documentary', 'Music'])
-        )
-    ]
+    # --- Representación de Géneros ---
+    # Matriz binaria de géneros construida en C por pandas (sin listas de Python). Los
+    # espacios ("Action, Drama") se quitan solo aquí: la columna 'genres' exportada no cambia
+    genre_dummies = movies['genres'].str.replace(' ', '', regex=False).str.get_dummies(sep=',')
+
+    # Excluir "Documentary" y "Music" (filas con esos géneros y sus columnas, ya vacías)
+    excluded = genre_dummies.columns.isin(['Documentary', 'Music'])
+    genre_features = genre_dummies.to_numpy(dtype=np.uint8)
+    keep = ~genre_features[:, excluded].any(axis=1)
+    movies = movies[keep]
+    genre_features = genre_features[keep][:, ~excluded]
+
+    # Géneros (ordenados) que definen el orden de las columnas
+    genre_classes = genre_dummies.columns[~excluded].tolist()
+
+    return movies, genre_classes, genre_features
+
+
+def build_tconst_index(movies):
+    """
+    Construye una única vez el diccionario tconst -> posición de la película en
+    `movies`, reutilizable para marcar las favoritas de todos los usuarios.
+    """
+    return dict(zip(movies['tconst'].tolist(), range(len(movies))))
 
-    # --- Entrenar Modelo (basado en géneros) ---
-    mlb = MultiLabelBinarizer()
-    genre_features = mlb.fit_transform(movies['genres_list'])
-    nn_model = NearestNeighbors(metric='cosine', algorithm='brute').fit(genre_features)
 
-    return movies, mlb, nn_model
+def build_class_index(genre_classes):
+    """
+    Construye una única vez el diccionario género -> columna de la matriz de géneros.
+    """
+    return {genre: i for i, genre in enumerate(genre_classes)}
 
 
 def load_custom_users():
@@ -101,15 +247,120 @@ def load_custom_users():
     Retorna:
       DataFrame con la información de los usuarios.
     """
-    return pd.read_csv("Dataset/clean/custom_users.csv")
+    return pd.read_csv(os.path.join(CLEAN_DIR, 'custom_users.csv'))
 
 
 # =============================================================================
 # FUNCIÓN DE RECOMENDACIÓN
 # =============================================================================
 
-def recommend_movies_for_user(user_id, df_users, movies, mlb, nn_model,
-                              n_recommendations=10, diversified_ratio=0.5, min_rating=7.0):
+def top_k_indices(scores, k):
+    """
+    Devuelve las posiciones de los `k` valores mayores de `scores`, ordenadas de
+    mayor a menor. Usa una selección parcial (O(N) + O(k log k)) en lugar de
+    ordenar el array completo.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _score_kernel(similarity, rating_score, runtime_minutes, user_watch_time):
+        """
+        Versión compilada con Numba de `compute_scores`: un único bucle sin arrays
+        intermedios. Todas las operaciones (y el redondeo) se hacen en float32 y en
+        el mismo orden que la versión NumPy, para obtener exactamente los mismos scores.
+        """
+        one, two, hundred = np.float32(1.0), np.float32(2.0), np.float32(100.0)
+        n = rating_score.shape[0]
+        total_score = np.empty(n, dtype=np.float32)
+        for i in range(n):
+            runtime_score = one / (one + abs(np.float32(runtime_minutes[i]) - user_watch_time))
+            score = np.float32(0.7) * similarity[i] + np.float32(0.3) * ((rating_score[i] + runtime_score) / two)
+            total_score[i] = np.rint(score * hundred) / hundred
+        return total_score
+else:
+    _score_kernel = None
+
+
+def compute_scores(similarity, rating_score, runtime_minutes, user_watch_time):
+    """
+    Calcula el score total (70% similitud, 30% media de rating y cercanía de duración)
+    directamente sobre arrays NumPy en float32. Si Numba está instalado se usa el
+    kernel compilado.
+    """
+    if _score_kernel is not None:
+        similarity = np.broadcast_to(np.asarray(similarity, dtype=np.float32), rating_score.shape)
+        return _score_kernel(similarity, rating_score, runtime_minutes, np.float32(user_watch_time))
+
+    runtime_diff = np.abs(runtime_minutes.astype(np.float32) - np.float32(user_watch_time))
+    runtime_score = np.float32(1.0) / (np.float32(1.0) + runtime_diff)
+    total_score = np.float32(0.7) * similarity + np.float32(0.3) * ((rating_score + runtime_score) / np.float32(2.0))
+    return total_score.round(2)
+
+
+def encode_genres(genres, class_to_idx):
+    """
+    Codifica una lista de géneros como vector float32 (1 en las columnas de esos
+    géneros). Los géneros desconocidos se ignoran.
+    """
+    vector = np.zeros(len(class_to_idx), dtype=np.float32)
+    for genre in genres:
+        j = class_to_idx.get(genre)
+        if j is not None:
+            vector[j] = 1
+    return vector
+
+
+def tailored_pool_size(n_recommendations):
+    """
+    Número de vecinas más cercanas con las que se arranca el camino "tailored".
+    """
+    return max(TAILORED_MIN_NEIGHBORS, n_recommendations * TAILORED_NEIGHBORS_PER_REC)
+
+
+def tailored_neighbors(genre_norm, class_to_idx, preferred_genres, n_neighbors):
+    """
+    Devuelve las `n_neighbors` películas más similares (coseno) a los géneros
+    preferidos y su similitud. Solo depende de la combinación de géneros, así que
+    el vector de similitudes se memoriza (una entrada por combinación) y se
+    reutiliza entre usuarios con los mismos gustos y al ampliar `n_neighbors`.
+    La memoria es propia de cada proceso: para el pool con 'fork' se precalcula en
+    el proceso padre (`_warm_tailored_cache`) y los hijos la heredan.
+    """
+    key = (id(genre_norm), tuple(sorted(set(preferred_genres))))
+    cached = _tailored_cache.get(key)
+    if cached is not None and cached[0] is genre_norm:
+        _tailored_cache.move_to_end(key)
+        _, sims, order = cached
+    else:
+        user_vector = encode_genres(preferred_genres, class_to_idx)
+        user_norm = np.linalg.norm(user_vector)
+        if user_norm > 0:
+            user_vector /= user_norm
+
+        # Similitud coseno contra todas las películas
+        sims = genre_norm @ user_vector
+        order = np.empty(0, dtype=np.intp)
+
+        if len(_tailored_cache) >= TAILORED_CACHE_SIZE:
+            _tailored_cache.popitem(last=False)  # La usada hace más tiempo
+
+    # Posiciones ordenadas por similitud: solo se recalculan si se piden más que las guardadas
+    if len(order) < min(n_neighbors, len(sims)):
+        order = top_k_indices(sims, n_neighbors)
+    _tailored_cache[key] = (genre_norm, sims, order)
+
+    indices = order[:n_neighbors]
+    return indices, sims[indices]
+
+
+def recommend_movies_for_user(user_id, df_users, movies, class_to_idx, genre_norm, genre_bits, tconst_to_idx,
+                              n_recommendations=DEFAULT_N_RECOMMENDATIONS, diversified_ratio=0.5, min_rating=7.0):
     """
     Genera recomendaciones con fórmula de scoring (70% similitud, 30% rating + runtime).
     Retorna un DataFrame con las películas recomendadas para un usuario concreto.
@@ -120,57 +371,57 @@ def recommend_movies_for_user(user_id, df_users, movies, mlb, nn_model,
     user_watch_time = user_row['average_watch_time']
     favorite_movies = [m.strip() for m in user_row['favorite_movies'].split(',')]
 
-    # --- Recomendaciones de géneros preferidos (Tailored) ---
-    user_vector = mlb.transform([preferred_genres])
-    distances, indices = nn_model.kneighbors(user_vector, n_neighbors=200)
-
-    tailored_df = movies.iloc[indices[0]].copy()
-    tailored_df['similarity'] = 1 - distances[0]
-    tailored_df = tailored_df[~tailored_df['tconst'].isin(favorite_movies)]
+    num_diverse = int(n_recommendations * diversified_ratio)
+    num_tailored = n_recommendations - num_diverse
 
-    # Cálculo de scores
-    tailored_df['averageRating'] = pd.to_numeric(tailored_df['averageRating'], errors='coerce').fillna(0)
-    tailored_df['runtime_score'] = 1 / (1 + abs(tailored_df['runtimeMinutes'] - user_watch_time))
-    tailored_df['rating_score'] = tailored_df['averageRating'] / 10.0
+    # Columnas numéricas como arrays: todo el cálculo se hace por posiciones
+    rating_arr = movies['averageRating'].values
+    rating_score_arr = movies['rating_score'].values
+    runtime_arr = movies['runtimeMinutes'].values
 
-    tailored_df['total_score'] = (
-            0.7 * tailored_df['similarity'] +
-            0.3 * ((tailored_df['rating_score'] + tailored_df['runtime_score']) / 2)
-    ).round(2)
+    # Películas candidatas: con el rating mínimo y que no sean favoritas (ya vistas)
+    fav_idx = [tconst_to_idx[t] for t in favorite_movies if t in tconst_to_idx]
+    fav_mask = np.zeros(len(movies), dtype=bool)
+    fav_mask[fav_idx] = True
+    candidate_mask = (rating_arr >= min_rating) & ~fav_mask
 
-    # Filtrar las que no cumplan el min_rating
-    tailored_df = tailored_df[tailored_df['averageRating'] >= min_rating].sort_values('total_score', ascending=False)
+    # --- Recomendaciones de géneros preferidos (Tailored) ---
+    # Partimos de las vecinas más similares. Si `movies` no llega filtrado
+    # por este mismo rating mínimo (o hay favoritas entre ellas), muchas vecinas no
+    # son candidatas válidas: ampliamos la búsqueda hasta reunir suficientes.
+    n_candidates = tailored_pool_size(n_recommendations)
+    n_neighbors = n_candidates
+    while True:
+        indices, sims = tailored_neighbors(genre_norm, class_to_idx, preferred_genres, n_neighbors=n_neighbors)
+        keep = candidate_mask[indices]
+        if keep.sum() >= n_candidates or n_neighbors >= len(movies):
+            break
+        n_neighbors *= 2
+    indices, sims = indices[keep], sims[keep]
+
+    # Cálculo de scores y selección de las mejores
+    tailored_scores = compute_scores(sims, rating_score_arr[indices], runtime_arr[indices], user_watch_time)
+    top = top_k_indices(tailored_scores, num_tailored)
+    top_tailored, tailored_scores = indices[top], tailored_scores[top]
 
     # --- Recomendaciones Diversificadas ---
-    diverse_df = movies[
-        movies['genres_list'].apply(lambda genres: all(g not in preferred_genres for g in genres))
-    ].copy()
-    diverse_df = diverse_df[~diverse_df['tconst'].isin(favorite_movies)]
+    # Películas sin ningún género preferido: un AND de 64 bits por película
+    pref_bits = np.uint64(sum(1 << class_to_idx[g] for g in set(preferred_genres) if g in class_to_idx))
+    has_preferred = (genre_bits & pref_bits) != 0
+    diverse_idx = np.flatnonzero(~has_preferred & candidate_mask)
 
     # Similaridad = 0 para géneros no preferidos
-    diverse_df['similarity'] = 0.0
-    diverse_df['averageRating'] = pd.to_numeric(diverse_df['averageRating'], errors='coerce').fillna(0)
-    diverse_df['runtime_score'] = 1 / (1 + abs(diverse_df['runtimeMinutes'] - user_watch_time))
-    diverse_df['rating_score'] = diverse_df['averageRating'] / 10.0
-
-    diverse_df['total_score'] = (
-            0.7 * diverse_df['similarity'] +
-            0.3 * ((diverse_df['rating_score'] + diverse_df['runtime_score']) / 2)
-    ).round(2)
-
-    diverse_df = diverse_df[diverse_df['averageRating'] >= min_rating].sort_values('total_score', ascending=False)
+    diverse_scores = compute_scores(np.float32(0.0), rating_score_arr[diverse_idx], runtime_arr[diverse_idx],
+                                    user_watch_time)
+    top = top_k_indices(diverse_scores, num_diverse)
+    top_diverse, diverse_scores = diverse_idx[top], diverse_scores[top]
 
     # --- Combinar Resultados (Tailored + Diversificado) ---
-    num_diverse = int(n_recommendations * diversified_ratio)
-    num_tailored = n_recommendations - num_diverse
-
-    final_recs = pd.concat([
-        tailored_df.head(num_tailored),
-        diverse_df.head(num_diverse)
-    ]).drop_duplicates(subset='tconst')
-
-    # --- Añadir la info del usuario para saber a quién va dirigida la recomendación ---
-    final_recs['user_id'] = user_id
+    # Solo ahora se materializan las (pocas) filas recomendadas
+    final_recs = movies.iloc[np.concatenate([top_tailored, top_diverse])].assign(
+        user_id=user_id,  # Para saber a quién va dirigida la recomendación
+        total_score=np.concatenate([tailored_scores, diverse_scores])
+    ).drop_duplicates(subset='tconst')
 
     # Reordenar columnas para claridad
     final_recs = final_recs[[
@@ -181,61 +432,125 @@ def recommend_movies_for_user(user_id, df_users, movies, mlb, nn_model,
     return final_recs
 
 
+def _init_worker(data):
+    """
+    Inicializa los datos compartidos en procesos que no se crean con 'fork'.
+    """
+    _worker_data.update(data)
+
+
+def _recommend_one(user_id):
+    """
+    Genera las recomendaciones de un usuario con los datos compartidos del proceso.
+    """
+    return recommend_movies_for_user(user_id, **_worker_data)
+
+
+def _warm_tailored_cache(user_ids, recommend_kwargs):
+    """
+    Calcula en el proceso actual las vecinas de cada combinación distinta de géneros
+    preferidos de `user_ids`, para que los procesos creados con 'fork' la hereden.
+    """
+    df_users = recommend_kwargs['df_users']
+    n_neighbors = tailored_pool_size(recommend_kwargs.get('n_recommendations', DEFAULT_N_RECOMMENDATIONS))
+    for genres in df_users.loc[df_users['user_id'].isin(user_ids), 'preferred_genres']:
+        preferred_genres = [g.strip() for g in genres.split(',')]
+        tailored_neighbors(recommend_kwargs['genre_norm'], recommend_kwargs['class_to_idx'], preferred_genres,
+                           n_neighbors=n_neighbors)
+
+
+def recommend_for_users(user_ids, **recommend_kwargs):
+    """
+    Genera las recomendaciones de varios usuarios en paralelo (un proceso por CPU).
+    Cada usuario es independiente y solo lee estructuras inmutables.
+
+    Retorna:
+      Iterador de DataFrames de recomendaciones, en el mismo orden que `user_ids`.
+    """
+    _worker_data.clear()
+    _worker_data.update(recommend_kwargs)
+
+    if platform.system() == 'Linux':
+        # Con 'fork' los hijos heredan los datos (y las vecinas ya calculadas) sin serializarlos
+        _warm_tailored_cache(user_ids, recommend_kwargs)
+        mp_context, initializer, initargs = multiprocessing.get_context('fork'), None, ()
+    elif len(user_ids) >= PARALLEL_MIN_USERS:
+        mp_context, initializer, initargs = multiprocessing.get_context('spawn'), _init_worker, (recommend_kwargs,)
+    else:
+        for user_id in user_ids:
+            yield _recommend_one(user_id)
+        return
+
+    max_workers = min(os.cpu_count() or 1, len(user_ids))
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                             initializer=initializer, initargs=initargs) as ex:
+        yield from ex.map(_recommend_one, user_ids)
+
+
 # =============================================================================
 # BLOQUE PRINCIPAL DE EJECUCIÓN
 # =============================================================================
 
 if __name__ == '__main__':
+    # Rating mínimo de las recomendaciones (Puedes alterar esto para peliculas con mucha nota)
+    min_rating = 8.0
+
     # --- Cargar y Preprocesar Datos ---
-    movies, mlb, nn_model = load_and_process_movies()
+    movies, genre_classes, genre_norm, genre_bits = load_and_process_movies(min_rating=min_rating)
+    class_to_idx = build_class_index(genre_classes)
+    tconst_to_idx = build_tconst_index(movies)
     df_users = load_custom_users()
 
     # --- Definir Usuarios Especiales a Evaluar ---
     special_user_ids = ["user_superhero", "user_drama", "user_scifi"]
 
-    # Lista para ir guardando las recomendaciones de cada usuario
-    all_recommendations = []
-
-    # --- Iterar Sobre Cada Usuario y Mostrar Recomendaciones ---
-    for user_id in special_user_ids:
-        print("==========================================")
-        print(f"Recomendaciones para el usuario: {user_id}\n")
+    # --- Generar las Recomendaciones de Todos los Usuarios (en paralelo) ---
+    all_recommendations = recommend_for_users(
+        special_user_ids,
+        df_users=df_users,
+        movies=movies,
+        class_to_idx=class_to_idx,
+        genre_norm=genre_norm,
+        genre_bits=genre_bits,
+        tconst_to_idx=tconst_to_idx,
+        n_recommendations=10,
+        diversified_ratio=0.5,
+        min_rating=min_rating
+    )
 
-        # Mostrar datos del usuario
-        print("Datos del usuario:")
-        print(df_users[df_users['user_id'] == user_id].to_string(index=False))
-        print("\nPelículas recomendadas:")
+    # Primeras filas del CSV final, para mostrarlas al terminar
+    preview = []
+    preview_rows = 20
 
-        # Generar las recomendaciones
-        recs = recommend_movies_for_user(
-            user_id,
-            df_users,
-            movies,
-            mlb,
-            nn_model,
-            n_recommendations=10,
-            diversified_ratio=0.5,
-            min_rating=8.0 ##Puedes alterar esto para peliculas con mucha nota
-        )
-        print(recs.to_string(index=False))
+    # --- Iterar Sobre Cada Usuario, Mostrar y Exportar Recomendaciones ---
+    # El CSV se escribe usuario a usuario: no se acumulan todas las recomendaciones en memoria
+    # Se usa `to_csv` sobre el mismo fichero abierto para mantener su formato (entrecomillado
+    # solo cuando hace falta), que es el que lee Power BI
+    with open(RECOMMENDATIONS_CSV, 'w', newline='', encoding='utf-8') as csv_file:
+        for user_id, recs in zip(special_user_ids, all_recommendations):
+            print("==========================================")
+            print(f"Recomendaciones para el usuario: {user_id}\n")
 
-        # Guardar en la lista
-        all_recommendations.append(recs)
+            # Mostrar datos del usuario
+            print("Datos del usuario:")
+            print(df_users[df_users['user_id'] == user_id].to_string(index=False))
+            print("\nPelículas recomendadas:")
+            print(recs.to_string(index=False))
 
-        print("==========================================\n")
+            print("==========================================\n")
 
-    # =========================================================================
-    # DF FINAL PARA EXPORTACIÓN A CSV
-    # =========================================================================
+            # Añadir las recomendaciones del usuario al CSV "recommendations.csv"
+            recs.to_csv(csv_file, index=False, header=csv_file.tell() == 0)
 
-    # Unir todas las recomendaciones en un solo DataFrame
-    df_recommendations = pd.concat(all_recommendations, ignore_index=True)
+            if sum(len(df) for df in preview) < preview_rows:
+                preview.append(recs)
 
-    # Guardar el DataFrame final en un archivo CSV llamado "recommendations.csv"
-    df_recommendations.to_csv('recommendations.csv', index=False)
-    print("Archivo 'recommendations.csv' generado correctamente.")
+    print(f"Archivo '{RECOMMENDATIONS_CSV}' generado correctamente.")
 
     # IMPORTANTE para Power BI:
     # Mostramos un mensaje final
     print("***** DataFrame FINAL PARA POWER BI *****")
-    print(df_recommendations.head(20))
+    if preview:
+        print(pd.concat(preview, ignore_index=True).head(preview_rows))
+    else:
+        print("No se ha generado ninguna recomendación.")